@@ -1,30 +1,75 @@
-import os
 import logging
-from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import PyMongoError
-
-# Load environment variables
-load_dotenv()
+from fastapi import Request
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.core.settings import Settings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# Database connection settings
-DATABASE_URL = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "recipes_db")
+# Database collection names
+PREFERENCES_COLLECTION = "ingredient_preferences"
+
+def make_client(settings: Settings) -> AsyncMongoClient:
+    """
+    Create a MongoDB client with the configured pool sizing and timeouts.
+    The client binds to the running event loop, so it is created in the app lifespan rather than at import.
+
+    Args:
+        settings (Settings): The application settings holding the connection options.
+
+    Returns:
+        AsyncMongoClient: A new MongoDB client.
+    """
+    return AsyncMongoClient(
+        settings.MONGO_URI,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    )
+
+def get_db(request: Request) -> AsyncDatabase:
+    """
+    FastAPI dependency returning the database opened in the app lifespan.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        AsyncDatabase: The application's MongoDB database.
+    """
+    return request.app.state.db
+
+async def ensure_indexes(db: AsyncDatabase):
+    """
+    Ensure a unique index on user_id so each user has a single preference document.
 
-# Initialize MongoDB client and database
-client = AsyncIOMotorClient(DATABASE_URL)
-db = client[MONGO_DB_NAME]
-preferences_collection = db["ingredient_preferences"]
+    Databases written by older releases may hold duplicate user_id documents, which makes the index build fail.
+    In that case the service starts without the index and logs how to fix the data.
 
-async def save_preference(user_id: str, liked_ingredients: list, excluded_ingredients: list):
+    Args:
+        db (AsyncDatabase): The database holding user preferences.
+    """
+    try:
+        await db[PREFERENCES_COLLECTION].create_index("user_id", unique=True)
+        logger.info("✅ Ensured unique index on user_id")
+    except DuplicateKeyError as e:
+        logger.error(
+            "❌ Could not create the unique index on %s.user_id because duplicate user_id documents exist. "
+            "Keep one document per user_id, delete the rest and restart the service. Details: %s",
+            PREFERENCES_COLLECTION, e
+        )
+
+async def save_preference(db: AsyncDatabase, user_id: str, liked_ingredients: list, excluded_ingredients: list):
     """
     Save or update user ingredient preferences in the database.
 
     Args:
+        db (AsyncDatabase): The database holding user preferences.
         user_id (str): The unique identifier for the user.
         liked_ingredients (list): List of ingredients the user likes.
         excluded_ingredients (list): List of ingredients the user dislikes.
@@ -33,33 +78,29 @@ async def save_preference(user_id: str, liked_ingredients: list, excluded_ingred
         PyMongoError: If an error occurs during the database operation.
     """
     try:
-        logger.info(f"Saving preference for user: {user_id}")
-        logger.debug(f"Liked: {liked_ingredients}, Excluded: {excluded_ingredients}")
-
-        existing_preference = await preferences_collection.find_one({"user_id": user_id})
-        
-        if existing_preference:
-            logger.info(f"Updating preference for user: {user_id}")
-            await preferences_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"liked_ingredients": liked_ingredients, "excluded_ingredients": excluded_ingredients}}
-            )
+        logger.info("Saving preference for user: %s", user_id)
+        logger.debug("Liked: %s, Excluded: %s", liked_ingredients, excluded_ingredients)
+
+        result = await db[PREFERENCES_COLLECTION].update_one(
+            {"user_id": user_id},
+            {"$set": {"liked_ingredients": liked_ingredients, "excluded_ingredients": excluded_ingredients}},
+            upsert=True
+        )
+
+        if result.upserted_id is not None:
+            logger.info("Created new preference for user: %s", user_id)
         else:
-            logger.info(f"Creating new preference for user: {user_id}")
-            await preferences_collection.insert_one({
-                "user_id": user_id,
-                "liked_ingredients": liked_ingredients,
-                "excluded_ingredients": excluded_ingredients
-            })
+            logger.info("Updated preference for user: %s", user_id)
     except PyMongoError as e:
-        logger.error(f"Database operation failed: {str(e)}")
+        logger.error("Database operation failed: %s", e)
         raise  
 
-async def get_preference(user_id: str):
+async def get_preference(db: AsyncDatabase, user_id: str):
     """
     Retrieve user ingredient preferences from the database.
 
     Args:
+        db (AsyncDatabase): The database holding user preferences.
         user_id (str): The unique identifier for the user.
 
     Returns:
@@ -70,29 +111,30 @@ async def get_preference(user_id: str):
         Exception: If an unexpected error occurs.
     """
     try:
-        logger.info(f"Retrieving preference for user: {user_id}")
-        preference = await preferences_collection.find_one({"user_id": user_id})
+        logger.info("Retrieving preference for user: %s", user_id)
+        preference = await db[PREFERENCES_COLLECTION].find_one({"user_id": user_id})
 
         if preference:
             preference["_id"] = str(preference["_id"])
-            logger.info(f"Preference found for user: {user_id}")
+            logger.info("Preference found for user: %s", user_id)
             return preference
         else:
-            logger.info(f"No preference found for user: {user_id}")
+            logger.info("No preference found for user: %s", user_id)
             return None
 
     except PyMongoError as e:
-        logger.error(f"Database operation failed: {str(e)}")
+        logger.error("Database operation failed: %s", e)
         raise  
     except Exception as e:
-        logger.error(f"Unexpected error in get_preference: {str(e)}")
+        logger.error("Unexpected error in get_preference: %s", e)
         raise  
 
-async def delete_preference(user_id: str):
+async def delete_preference(db: AsyncDatabase, user_id: str):
     """
     Delete user ingredient preferences from the database.
 
     Args:
+        db (AsyncDatabase): The database holding user preferences.
         user_id (str): The unique identifier for the user.
 
     Returns:
@@ -103,26 +145,20 @@ async def delete_preference(user_id: str):
         Exception: If an unexpected error occurs.
     """
     try:
-        logger.info(f"Attempting to delete preference for user: {user_id}")
+        logger.info("Attempting to delete preference for user: %s", user_id)
 
-        existing_preference = await preferences_collection.find_one({"user_id": user_id})
-        
-        if not existing_preference:
-            logger.warning(f"No preference found for user: {user_id}")
-            return {"message": "No preference found to delete."}
-
-        result = await preferences_collection.delete_one({"user_id": user_id})
+        result = await db[PREFERENCES_COLLECTION].delete_one({"user_id": user_id})
 
         if result.deleted_count > 0:
-            logger.info(f"Successfully deleted preference for user: {user_id}")
+            logger.info("Successfully deleted preference for user: %s", user_id)
             return {"message": "Preference deleted successfully."}
         else:
-            logger.warning(f"No preference deleted for user: {user_id}")
-            return {"message": "No preference was deleted."}
+            logger.warning("No preference found for user: %s", user_id)
+            return {"message": "No preference found to delete."}
 
     except PyMongoError as e:
-        logger.error(f"Database operation failed: {str(e)}")
+        logger.error("Database operation failed: %s", e)
         raise  
     except Exception as e:
-        logger.error(f"Unexpected error in delete_preference: {str(e)}")
+        logger.error("Unexpected error in delete_preference: %s", e)
         raise
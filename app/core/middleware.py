@@ -0,0 +1,28 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+
+class EventStreamGZipResponder(GZipResponder):
+    """
+    GZip responder that passes server-sent event streams through uncompressed.
+    """
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            # Treat event streams like pre-encoded responses so every event is flushed as soon as it is sent
+            if content_type.startswith("text/event-stream"):
+                self.content_encoding_set = True
+
+
+class EventStreamGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that compresses regular responses but leaves `text/event-stream` responses untouched.
+    """
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = EventStreamGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
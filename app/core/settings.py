@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,18 +10,27 @@ class Settings:
     Application settings loaded from environment variables.
     """
     PROJECT_NAME: str = "Recipe AI Service"
-    MONGO_URI: str = os.getenv("MONGO_URI")
-    MONGO_DB_NAME: str = os.getenv("MONGO_DB_NAME")
-    GITHUB_TOKEN: str = os.getenv("GITHUB_TOKEN")
-    API_KEY: str = os.getenv("API_KEY", "your_default_api_key")  # Default API key for authentication
 
     def __init__(self):
         """
-        Ensures that essential configurations are properly loaded.
+        Reads the configuration from the environment and ensures that essential values are present.
         
         Raises:
             ValueError: If required environment variables are missing.
         """
+        self.MONGO_URI: str = os.getenv("MONGO_URI")
+        self.MONGO_DB_NAME: str = os.getenv("MONGO_DB_NAME")
+        self.GITHUB_TOKEN: str = os.getenv("GITHUB_TOKEN")
+        self.API_KEY: str = os.getenv("API_KEY", "your_default_api_key")  # Default API key for authentication
+        self.LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+        # MongoDB connection pool sizing and timeouts
+        self.MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+        self.MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+        self.MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000"))
+        self.MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "2000"))
+        self.MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "1000"))
+
         missing_vars = []
         if not self.MONGO_URI:
             missing_vars.append("MONGO_URI")
@@ -32,5 +42,11 @@ class Settings:
         if missing_vars:
             raise ValueError(f"Missing environment variables: {', '.join(missing_vars)}")
 
-# Create a singleton instance of Settings for the app
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Returns the application settings, created once and reused for the lifetime of the process.
+    The MongoDB settings are read when the app starts and the LLM client settings when recipe_ai is imported;
+    call `get_settings.cache_clear()` after changing the environment to pick up new values.
+    """
+    return Settings()
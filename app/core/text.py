@@ -0,0 +1,19 @@
+from functools import lru_cache
+from nltk.stem import WordNetLemmatizer
+
+# Initialize WordNet Lemmatizer
+lemmatizer = WordNetLemmatizer()
+
+
+@lru_cache(maxsize=8192)
+def normalize_ingredient(ingredient: str) -> str:
+    """
+    Normalizes an ingredient string by converting it to lowercase and lemmatizing it.
+
+    Args:
+        ingredient (str): The ingredient string to normalize.
+
+    Returns:
+        str: The normalized ingredient string.
+    """
+    return lemmatizer.lemmatize(ingredient.lower().replace(" ", ""))
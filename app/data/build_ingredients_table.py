@@ -0,0 +1,52 @@
+"""
+build_ingredients_table.py - Builds the ingredient lookup table used by the recipe service.
+
+Reads `ingredients_table.csv` and pickles a `{ingredient: category}` dictionary with both columns
+lowercased and stripped of spaces, so the service can load it at startup without parsing the CSV.
+Re-run after editing the CSV:
+
+    python -m app.data.build_ingredients_table
+"""
+
+import csv
+import pickle
+
+CSV_PATH = "app/data/ingredients_table.csv"
+PICKLE_PATH = "app/data/ingredients_table.pkl"
+
+
+def normalize(value: str) -> str:
+    """
+    Normalizes a dataset value by converting it to lowercase and removing spaces.
+
+    Args:
+        value (str): The value to normalize.
+
+    Returns:
+        str: The normalized value.
+    """
+    return value.lower().replace(" ", "")
+
+
+def build_ingredient_table(csv_path: str = CSV_PATH) -> dict[str, str]:
+    """
+    Builds the ingredient to category mapping from the dataset CSV.
+
+    Args:
+        csv_path (str): Path to the dataset CSV with `Ingredient` and `Category` columns.
+
+    Returns:
+        dict[str, str]: Normalized ingredient names mapped to normalized categories. The first entry wins on duplicates.
+    """
+    ingredient_category = {}
+    with open(csv_path, newline="", encoding="utf-8") as csv_file:
+        for row in csv.DictReader(csv_file):
+            ingredient_category.setdefault(normalize(row["Ingredient"]), normalize(row["Category"]))
+    return ingredient_category
+
+
+if __name__ == "__main__":
+    table = build_ingredient_table()
+    with open(PICKLE_PATH, "wb") as pickle_file:
+        pickle.dump(table, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"Wrote {len(table)} ingredients to {PICKLE_PATH}")
@@ -5,21 +5,30 @@ This module sets up a FastAPI application for managing user preferences and gene
 It includes:
 - Connecting to MongoDB with retries.
 - API endpoints for saving, retrieving, and deleting user preferences.
-- A recipe generation endpoint using AI.
+- A recipe generation endpoint using AI, with optional streaming of the LLM response.
 
 Author: Amit Kumar
 """
 
+import os
+import orjson
 import uvicorn
 import logging
 import asyncio
-from fastapi import FastAPI, HTTPException
+from typing import AsyncIterator
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.api.routes import router
-from app.core.db_manager import save_preference, db, get_preference, delete_preference
+from app.core.middleware import EventStreamGZipMiddleware
+from app.core.db_manager import (
+    make_client, get_db, ensure_indexes, save_preference, get_preference, delete_preference
+)
+from app.core.settings import get_settings
 from app.schemas.recipe_schema import RecipeRequest
-from app.services.recipe_ai import generate_recipe  # Ensure correct import path
+from app.services.recipe_ai import build_recipe_prompt, generate_recipe, stream_recipe  # Ensure correct import path
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -29,65 +38,74 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """
     Context manager for application lifespan.
-    - Establishes and verifies a connection to MongoDB.
+    - Creates the MongoDB client on the running event loop and stores it on `app.state`.
+    - Verifies the connection to MongoDB, warming up the connection pool.
     - Retries connection up to 3 times if it fails.
-    - Ensures proper cleanup when shutting down.
+    - Ensures a unique index on user_id for preference lookups.
+    - Closes the MongoDB client when shutting down or if startup fails.
     """
     logger.info("🚀 Starting Recipe AI Service...")
-    retries = 3
-    while retries > 0:
-        try:
-            await db.command("ping")  # Check database connection
-            logger.info("✅ Successfully connected to MongoDB")
-            break
-        except Exception as e:
-            logger.error(f"❌ Failed to connect to MongoDB: {str(e)}")
-            retries -= 1
-            if retries == 0:
-                raise
-            await asyncio.sleep(5)  # Wait before retrying
-    yield
-    logger.info("🛑 Shutting down Recipe AI Service...")
+    settings = get_settings()
+    app.state.mongo = make_client(settings)
+    app.state.db = db = app.state.mongo[settings.MONGO_DB_NAME]
+
+    try:
+        retries = 3
+        while retries > 0:
+            try:
+                await db.command("ping")  # Check database connection
+                logger.info("✅ Successfully connected to MongoDB")
+                # Open minPoolSize connections before accepting traffic
+                await asyncio.gather(*(db.command("ping") for _ in range(settings.MONGO_MIN_POOL_SIZE)))
+                break
+            except Exception as e:
+                logger.error("❌ Failed to connect to MongoDB: %s", e)
+                retries -= 1
+                if retries == 0:
+                    raise
+                await asyncio.sleep(5)  # Wait before retrying
+
+        await ensure_indexes(db)
+        yield
+        logger.info("🛑 Shutting down Recipe AI Service...")
+    finally:
+        # Also runs when startup fails, so the client's pool and monitor tasks are released
+        await app.state.mongo.close()
 
 # Initialize FastAPI application
-app = FastAPI(title="Recipe AI Service", lifespan=lifespan)
+app = FastAPI(title="Recipe AI Service", lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(EventStreamGZipMiddleware, minimum_size=512)  # Compress large JSON responses; SSE streams pass through
 app.include_router(router)
 
 @app.post("/save-preference/")
-async def save_user_preferences(request: RecipeRequest):
+async def save_user_preferences(request: RecipeRequest, db: AsyncDatabase = Depends(get_db)):
     """
     Save user ingredient preferences to the database.
-    - Verifies database connection before saving.
     - Logs the process for debugging purposes.
     """
     logging.info("📌 Received request to save preferences")
-    logging.debug(f"Request data: {request.dict()}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request data: %s", request.model_dump())
 
     try:
-        await db.command("ping")
-        logging.info("✅ Database connection confirmed")
-
-        await save_preference(request.user_id, request.liked_ingredients, request.excluded_ingredients)
+        await save_preference(db, request.user_id, request.liked_ingredients, request.excluded_ingredients)
         logging.info("✅ Preferences saved successfully")
 
         return {"message": "Preferences saved successfully"}
     except Exception as e:
-        logging.error(f"❌ Error in save_user_preferences: {str(e)}", exc_info=True)
+        logging.error("❌ Error in save_user_preferences: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error saving preferences: {str(e)}")
 
 @app.get("/get-preference/{user_id}")
-async def get_user_preferences(user_id: str):
+async def get_user_preferences(user_id: str, db: AsyncDatabase = Depends(get_db)):
     """
     Retrieve user preferences based on user_id.
     - Checks if preferences exist before returning.
     """
-    logging.info(f"📌 Received request to get preferences for user: {user_id}")
+    logging.info("📌 Received request to get preferences for user: %s", user_id)
 
     try:
-        await db.command("ping")
-        logging.info("✅ Database connection confirmed")
-
-        preferences = await get_preference(user_id)
+        preferences = await get_preference(db, user_id)
         if preferences:
             logging.info("✅ Preferences found and returned")
             return preferences
@@ -95,22 +113,19 @@ async def get_user_preferences(user_id: str):
             logging.warning("⚠️ No preferences found for this user")
             raise HTTPException(status_code=404, detail="Preferences not found")
     except Exception as e:
-        logging.error(f"❌ Error in get_user_preferences: {str(e)}", exc_info=True)
+        logging.error("❌ Error in get_user_preferences: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error retrieving preferences: {str(e)}")
 
 @app.delete("/delete-preference/{user_id}")
-async def delete_user_preferences(user_id: str):
+async def delete_user_preferences(user_id: str, db: AsyncDatabase = Depends(get_db)):
     """
     Delete user preferences from the database.
     - Checks if preferences exist before attempting deletion.
     """
-    logging.info(f"📌 Received request to delete preferences for user: {user_id}")
+    logging.info("📌 Received request to delete preferences for user: %s", user_id)
 
     try:
-        await db.command("ping")
-        logging.info("✅ Database connection confirmed")
-
-        response = await delete_preference(user_id)
+        response = await delete_preference(db, user_id)
         if "successfully" in response["message"]:
             logging.info("✅ Preferences deleted successfully")
             return response
@@ -118,33 +133,72 @@ async def delete_user_preferences(user_id: str):
             logging.warning("⚠️ No preferences found to delete")
             raise HTTPException(status_code=404, detail=response["message"])
     except Exception as e:
-        logging.error(f"❌ Error in delete_user_preferences: {str(e)}", exc_info=True)
+        logging.error("❌ Error in delete_user_preferences: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error deleting preferences: {str(e)}")
 
+async def to_server_sent_events(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Frame streamed LLM text as server-sent events.
+    - Each chunk is sent JSON-encoded as a `data` event.
+    - Ends with a `done` event, or an `error` event if the stream fails.
+    """
+    try:
+        async for chunk in chunks:
+            yield f"data: {orjson.dumps(chunk).decode()}\n\n"
+        yield "event: done\ndata: [DONE]\n\n"
+    except Exception as e:
+        logger.error("❌ Error while streaming recipe: %s", e, exc_info=True)
+        yield f"event: error\ndata: {orjson.dumps(str(e)).decode()}\n\n"
+
 @app.post("/generate-recipe/")
-async def generate_recipe_endpoint(request: RecipeRequest):
+async def generate_recipe_endpoint(
+    request: RecipeRequest,
+    background_tasks: BackgroundTasks,
+    stream: bool = False,
+    db: AsyncDatabase = Depends(get_db)
+):
     """
     Generate a recipe based on user preferences and AI.
+    - Saves the user's preferences in the background, after the response is sent.
     - Calls the AI recipe generation function.
     - Returns generated recipes as a response.
+    - With `stream=true`, streams the raw LLM response as server-sent events instead.
     """
     logging.info("📌 Received request for recipe generation")
-    logging.debug(f"Request data: {request.dict()}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request data: %s", request.model_dump())
 
     try:
+        background_tasks.add_task(save_preference, db, request.user_id, request.liked_ingredients, request.excluded_ingredients)
+
+        if stream:
+            prompt, _, _ = await build_recipe_prompt(request)
+
+            logging.info("📌 Now streaming recipe")
+            return StreamingResponse(to_server_sent_events(stream_recipe(prompt)), media_type="text/event-stream")
+
         logging.info("📌 Now generating recipe")
         recipes = await generate_recipe(request)
 
-        logging.info(f"✅ Successfully generated {len(recipes)} recipes")
+        logging.info("✅ Successfully generated %d recipes", len(recipes))
         return recipes
     except Exception as e:
-        logger.error(f"❌ Error in generate_recipe_endpoint: {str(e)}", exc_info=True)
+        logger.error("❌ Error in generate_recipe_endpoint: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error generating recipe: {str(e)}")
 
 if __name__ == "__main__":
     """
     Run the FastAPI application using Uvicorn.
     - Sets host to 0.0.0.0 for external accessibility.
-    - Enables automatic reload for development.
+    - Runs WEB_CONCURRENCY workers (default 4) on uvloop and httptools for production throughput.
+    - Enables automatic reload for development when DEV=1 (Uvicorn then runs a single process).
     """
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+        loop="uvloop",
+        http="httptools",
+        reload=os.getenv("DEV", "0") == "1"
+    )
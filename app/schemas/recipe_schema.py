@@ -1,5 +1,6 @@
-from pydantic import BaseModel, field_validator, ValidationInfo
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator, ValidationInfo
+from typing import List
+from app.core.text import normalize_ingredient
 
 class Ingredient(BaseModel):
     """
@@ -14,16 +15,16 @@ class RecipeRequest(BaseModel):
     """
     user_id: str
     available_ingredients: List[str]
-    liked_ingredients: Optional[List[str]] = None
-    excluded_ingredients: Optional[List[str]] = None
+    liked_ingredients: List[str] = Field(default_factory=list)
+    excluded_ingredients: List[str] = Field(default_factory=list)
 
-    @field_validator("liked_ingredients", "excluded_ingredients", mode="before")
+    @field_validator("available_ingredients", "liked_ingredients", "excluded_ingredients", mode="after")
     @classmethod
-    def default_empty_list(cls, ingredients):
+    def normalize_ingredients(cls, ingredients: List[str]):
         """
-        Ensures that liked_ingredients and excluded_ingredients default to an empty list if not provided.
+        Normalizes ingredients once at parse time so downstream code receives lowercased, lemmatized names.
         """
-        return ingredients if ingredients is not None else []
+        return [normalize_ingredient(ingredient) for ingredient in ingredients]
 
     @field_validator("liked_ingredients", "excluded_ingredients", mode="before")
     @classmethod
@@ -38,14 +39,23 @@ class RecipeRequest(BaseModel):
         Raises:
             ValueError: If an ingredient is not found in the available_ingredients list.
         """
-        available = info.data.get("available_ingredients", [])
+        available = set(info.data.get("available_ingredients", []) or [])  # Already normalized
         if not isinstance(ingredients, list):
             raise ValueError("Ingredients must be a list")
         for ingredient in ingredients:
-            if ingredient.lower() not in [a.lower() for a in available]:
+            if normalize_ingredient(ingredient) not in available:
                 raise ValueError(f"'{ingredient}' must be in available_ingredients")
         return ingredients
 
+    # Declared last so it runs first: Pydantic applies "before" validators in reverse order
+    @field_validator("liked_ingredients", "excluded_ingredients", mode="before")
+    @classmethod
+    def default_empty_list(cls, ingredients):
+        """
+        Ensures that an explicit null for liked_ingredients or excluded_ingredients becomes an empty list.
+        """
+        return ingredients if ingredients is not None else []
+
 class RecipeResponse(BaseModel):
     """
     Response schema for a generated recipe.
@@ -1,111 +1,142 @@
-import os
-import json
+import re
+import orjson
+import asyncio
+import pickle
+import hashlib
 import logging
-import pandas as pd
-from typing import List, Optional
-from nltk.stem import WordNetLemmatizer
-from openai import OpenAI  # Import OpenAI
+from typing import Any, AsyncIterator, List, Optional
+from cachetools import LRUCache, TTLCache
+from openai import AsyncOpenAI  # Import async OpenAI client
 from app.schemas.recipe_schema import RecipeRequest, RecipeResponseWithDebug, Ingredient, DebugInfo
-from app.core.settings import settings
-from app.core.db_manager import save_preference, db
+from app.core.settings import get_settings
+from app.core.text import normalize_ingredient
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client
-client = OpenAI(
+client = AsyncOpenAI(
     base_url="https://models.inference.ai.azure.com",
-    api_key=os.getenv("GITHUB_TOKEN")
+    api_key=get_settings().GITHUB_TOKEN
 )
 
-# Load dataset for ingredient categories
-DATASET_PATH = "app/data/ingredients_table.csv"
-ingredient_df = pd.read_csv(DATASET_PATH)
+# Limit concurrent LLM requests to apply backpressure instead of hitting upstream rate limits
+LLM_SEM = asyncio.Semaphore(get_settings().LLM_MAX_CONCURRENCY)
 
-# Preprocess dataset
-ingredient_df["Ingredient"] = ingredient_df["Ingredient"].str.lower().str.replace(" ", "")
-ingredient_df["Category"] = ingredient_df["Category"].str.lower().str.replace(" ", "")
+# Load prebuilt ingredient to category lookup (see app/data/build_ingredients_table.py)
+DATASET_PATH = "app/data/ingredients_table.pkl"
+with open(DATASET_PATH, "rb") as dataset_file:
+    INGREDIENT_CATEGORY: dict[str, str] = pickle.load(dataset_file)
+
+# Matches Markdown code fences (optionally tagged json) around LLM JSON replies
+JSON_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
 
 # Define core ingredient categories
 CORE_CATEGORIES = {"protein", "vegetables", "fruits", "carbs"}
 
-# Initialize WordNet Lemmatizer
-lemmatizer = WordNetLemmatizer()
+# Memoized LLM verdicts for ingredients missing from the dataset (least recently used evicted first)
+llm_verdict_cache: LRUCache = LRUCache(maxsize=8192)
+
+# Generated recipes keyed by canonicalized request, kept for an hour
+recipe_cache: TTLCache = TTLCache(maxsize=1024, ttl=3600)
 
 
-def normalize_ingredient(ingredient: str) -> str:
+def parse_llm_json(reply: str) -> Any:
     """
-    Normalizes an ingredient string by converting it to lowercase and lemmatizing it.
+    Parses a JSON reply from the LLM, stripping any surrounding Markdown code fence.
 
     Args:
-        ingredient (str): The ingredient string to normalize.
+        reply (str): The raw LLM reply.
 
     Returns:
-        str: The normalized ingredient string.
+        Any: The decoded JSON value.
     """
-    return lemmatizer.lemmatize(ingredient.lower().replace(" ", ""))
+    return orjson.loads(JSON_FENCE.sub("", reply))
 
 
-def call_llm_for_ingredient(ingredient: str) -> Optional[dict]:
+async def call_llm_for_ingredients_batch(ingredients: List[str]) -> dict[str, tuple[bool, Optional[str]]]:
     """
-    Calls the LLM to validate and categorize an ingredient if necessary.
+    Calls the LLM once to validate and categorize a batch of ingredients.
 
     Args:
-        ingredient (str): The ingredient to validate and categorize.
+        ingredients (List[str]): The ingredients to validate and categorize.
 
     Returns:
-        Optional[dict]: A dictionary containing the validation result and category, or None if validation fails.
+        dict[str, tuple[bool, Optional[str]]]: A (valid, category) verdict for each ingredient the LLM answered for.
+        Malformed entries are skipped, and an empty dictionary is returned if the call or the reply fails.
     """
     try:
         prompt = (
-            f"Is '{ingredient}' a food ingredient? Reply only with YES or NO. "
-            f"If YES, specify category from {CORE_CATEGORIES}. If none, return 'None'. "
-            "Strictly output JSON: {\"valid\": \"YES/NO\", \"category\": \"core_category_or_None\"}."
+            "For each ingredient in this JSON list, decide if it is a food ingredient. "
+            f"If it is, specify its category from {CORE_CATEGORIES}. If none, use 'None'. "
+            "Strictly output a JSON list with one object per ingredient: "
+            "[{\"ingredient\": \"ingredient\", \"valid\": \"YES/NO\", \"category\": \"core_category_or_None\"}]. "
+            f"Ingredients: {orjson.dumps(ingredients).decode()}"
         )
 
-        response = client.chat.completions.create(
-            messages=[{"role": "system", "content": prompt}],
-            model="gpt-4o-mini",
-            temperature=0,
-            max_tokens=20,
-            top_p=1
-        )
+        async with LLM_SEM:
+            response = await client.chat.completions.create(
+                messages=[{"role": "system", "content": prompt}],
+                model="gpt-4o-mini",
+                temperature=0,
+                max_tokens=100 + 40 * len(ingredients),  # Fixed allowance for fences and formatting
+                top_p=1
+            )
 
         reply = response.choices[0].message.content.strip()
-        logger.info(f"🔍 LLM Raw Response for '{ingredient}': {reply}")
+        logger.info("🔍 LLM Raw Response for %s: %s", ingredients, reply)
 
-        return json.loads(reply)
+        results = parse_llm_json(reply)
+        if not isinstance(results, list):
+            raise ValueError(f"expected a JSON list, got {type(results).__name__}")
     except Exception as e:
-        logger.error(f"⚠️ LLM validation failed for '{ingredient}': {e}")
-        return None
-
-
-def is_valid_ingredient(ingredient: str) -> Optional[dict]:
+        logger.error("⚠️ LLM validation failed for %s: %s", ingredients, e)
+        return {}
+
+    # Parse each verdict on its own so one malformed entry doesn't discard the whole batch
+    verdicts = {}
+    for result in results:
+        try:
+            valid = result["valid"]
+            is_valid = valid if isinstance(valid, bool) else str(valid).strip().upper() == "YES"
+            category = result.get("category")
+            verdicts[normalize_ingredient(result["ingredient"])] = (
+                is_valid, category if category not in (None, "None") else None
+            )
+        except Exception as e:
+            logger.warning("⚠️ Skipping malformed LLM verdict %s: %s", result, e)
+    return verdicts
+
+
+async def validate_unknown_ingredients(ingredients: List[str]) -> dict[str, Optional[str]]:
     """
-    Checks if an ingredient is valid and gets its category from the database before calling the LLM.
+    Validates ingredients missing from the dataset, batching all unseen ones into a single LLM call.
+    Verdicts are memoized, so repeated ingredients never reach the LLM twice.
 
     Args:
-        ingredient (str): The ingredient to check.
+        ingredients (List[str]): The normalized ingredients to validate.
 
     Returns:
-        Optional[dict]: A dictionary containing the ingredient and its category, or None if the ingredient is invalid.
+        dict[str, Optional[str]]: The category of each ingredient confirmed as food (None if it has no core category).
     """
-    normalized_ingredient = normalize_ingredient(ingredient)
+    pending = [ing for ing in dict.fromkeys(ingredients) if ing not in llm_verdict_cache]
 
-    category = get_ingredient_category(normalized_ingredient)
-    if category:
-        return {"ingredient": normalized_ingredient, "category": category}
+    if pending:
+        logger.info("🔎 Validating %s via LLM.", pending)
+        verdicts = await call_llm_for_ingredients_batch(pending)
 
-    logger.info(f"🔎 Checking '{normalized_ingredient}' in dataset before LLM.")
-    llm_result = call_llm_for_ingredient(normalized_ingredient)
+        for ing in pending:
+            # Failed lookups are not memoized so they are retried on the next request
+            if ing in verdicts:
+                llm_verdict_cache[ing] = verdicts[ing]
 
-    if llm_result and llm_result["valid"].upper() == "YES":
-        return {
-            "ingredient": normalized_ingredient,
-            "category": llm_result["category"] if llm_result["category"] != "None" else None
-        }
+    validated = {}
+    for ing in ingredients:
+        is_valid, category = llm_verdict_cache.get(ing, (False, None))
+        if is_valid:
+            validated[ing] = category
 
-    return None
+    return validated
 
 
 def get_ingredient_category(ingredient: str) -> Optional[str]:
@@ -118,8 +149,102 @@ def get_ingredient_category(ingredient: str) -> Optional[str]:
     Returns:
         Optional[str]: The category of the ingredient, or None if not found.
     """
-    category_row = ingredient_df[ingredient_df["Ingredient"] == ingredient]
-    return category_row["Category"].values[0] if not category_row.empty else None
+    return INGREDIENT_CATEGORY.get(ingredient)
+
+
+def recipe_cache_key(request: RecipeRequest) -> bytes:
+    """
+    Builds a cache key for a recipe request that ignores the user and the order of ingredients.
+
+    Args:
+        request (RecipeRequest): The recipe request object with normalized ingredients.
+
+    Returns:
+        bytes: The SHA-256 digest of the canonicalized ingredient lists.
+    """
+    canonical = orjson.dumps({
+        "a": sorted(request.available_ingredients),
+        "l": sorted(request.liked_ingredients),
+        "e": sorted(request.excluded_ingredients)
+    })
+    return hashlib.sha256(canonical).digest()
+
+
+async def build_recipe_prompt(request: RecipeRequest) -> tuple[str, List[str], List[str]]:
+    """
+    Validates the request's ingredients and builds the recipe generation prompt for the LLM.
+
+    Args:
+        request (RecipeRequest): The recipe request object containing user preferences and available ingredients.
+
+    Returns:
+        tuple[str, List[str], List[str]]: The prompt, the ingredients matched with the database,
+        and the ingredients matched via the LLM.
+
+    Raises:
+        ValueError: If preferences conflict or there are not enough valid ingredients.
+    """
+    logger.info("Available Ingredients: %s", request.available_ingredients)
+    logger.info("Liked Ingredients: %s", request.liked_ingredients)
+    logger.info("Excluded Ingredients: %s", request.excluded_ingredients)
+
+    # Check for conflicting preferences
+    conflicting_ingredients = set(request.liked_ingredients) & set(request.excluded_ingredients)
+    if conflicting_ingredients:
+        error_msg = f"Conflicting preferences detected. These ingredients cannot be both liked and excluded: {', '.join(conflicting_ingredients)}"
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    valid_ingredients = []
+    matched_with_database = []
+    matched_via_llm = []
+    ingredient_categories = set()
+
+    # Match ingredients against the dataset, then validate the rest with a single LLM call
+    dataset_categories = {ing: get_ingredient_category(ing) for ing in request.available_ingredients}
+    unknown_ingredients = [ing for ing, category in dataset_categories.items() if not category]
+    llm_categories = await validate_unknown_ingredients(unknown_ingredients) if unknown_ingredients else {}
+
+    # Build the ingredient lists in one pass to keep the input order
+    for ing in request.available_ingredients:
+        if dataset_categories[ing]:
+            category = dataset_categories[ing]
+            matched_with_database.append(ing)
+        elif ing in llm_categories:
+            category = llm_categories[ing]
+            matched_via_llm.append(ing)
+        else:
+            logger.warning("'%s' is not recognized as a valid food ingredient.", ing)
+            continue
+
+        valid_ingredients.append(ing)
+        if category:
+            ingredient_categories.add(category)
+
+    logger.info("Valid Ingredients: %s", valid_ingredients)
+    logger.info("Ingredient Categories: %s", ingredient_categories)
+    logger.info("✅ Valid Ingredients matched from database: %s", matched_with_database)
+    logger.info("✅ Valid Ingredients matched via LLM: %s", matched_via_llm)
+
+    if len(valid_ingredients) < 3:
+        raise ValueError("Not enough valid ingredients. Provide at least 3 food ingredients.")
+
+    if not ingredient_categories.intersection(CORE_CATEGORIES):
+        logger.error("No core ingredients found. Available categories: %s", ingredient_categories)
+        raise ValueError("At least one ingredient should be a vegetable, carb, protein, or fruit.")
+
+    prompt = (
+        f"Generate up to 5 recipes using these ingredients: {', '.join(valid_ingredients)}. "
+        f"Give preference to: {', '.join(request.liked_ingredients)}. "
+        f"Exclude: {', '.join(request.excluded_ingredients)}. "
+        "Ensure the recipes make culinary sense. "
+        "Each recipe must be in JSON format with the following keys: "
+        "'title', 'ingredients' (list of objects with 'ingredient' and 'quantity'), "
+        "'instructions' (list), 'estimated_cooking_time', 'difficulty_level'. "
+        "Return only a valid JSON list, no extra text."
+    )
+
+    return prompt, matched_with_database, matched_via_llm
 
 
 async def generate_recipe(request: RecipeRequest) -> list[RecipeResponseWithDebug]:
@@ -133,95 +258,64 @@ async def generate_recipe(request: RecipeRequest) -> list[RecipeResponseWithDebu
         list[RecipeResponseWithDebug]: A list of generated recipes with debugging information.
     """
     try:
-        await db.command("ping")
-        logger.info("✅ Database connection confirmed")
-
-        await save_preference(request.user_id, request.liked_ingredients, request.excluded_ingredients)
-        logger.info("✅ Preferences saved successfully")
-
-        # Normalize ingredients
-        request.available_ingredients = [normalize_ingredient(ing) for ing in request.available_ingredients]
-        request.liked_ingredients = [normalize_ingredient(ing) for ing in request.liked_ingredients]
-        request.excluded_ingredients = [normalize_ingredient(ing) for ing in request.excluded_ingredients]
-
-        logger.info(f"Available Ingredients: {request.available_ingredients}")
-        logger.info(f"Liked Ingredients: {request.liked_ingredients}")
-        logger.info(f"Excluded Ingredients: {request.excluded_ingredients}")
-
-        # Check for conflicting preferences
-        conflicting_ingredients = set(request.liked_ingredients) & set(request.excluded_ingredients)
-        if conflicting_ingredients:
-            error_msg = f"Conflicting preferences detected. These ingredients cannot be both liked and excluded: {', '.join(conflicting_ingredients)}"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-
-        valid_ingredients = []
-        matched_with_database = []
-        matched_via_llm = []
-        ingredient_categories = set()
-
-        for ing in request.available_ingredients:
-            result = is_valid_ingredient(ing)
-
-            if result:
-                valid_ingredients.append(result["ingredient"])
-                category = result["category"]
-
-                if category:
-                    ingredient_categories.add(category)
-
-                if result["ingredient"] in ingredient_df["Ingredient"].values:
-                    matched_with_database.append(result["ingredient"])
-                else:
-                    matched_via_llm.append(result["ingredient"])
-            else:
-                logger.warning(f"'{ing}' is not recognized as a valid food ingredient.")
-
-        logger.info(f"Valid Ingredients: {valid_ingredients}")
-        logger.info(f"Ingredient Categories: {ingredient_categories}")
-        logger.info(f"✅ Valid Ingredients matched from database: {matched_with_database}")
-        logger.info(f"✅ Valid Ingredients matched via LLM: {matched_via_llm}")
-
-        if len(valid_ingredients) < 3:
-            raise ValueError("Not enough valid ingredients. Provide at least 3 food ingredients.")
-
-        if not ingredient_categories.intersection(CORE_CATEGORIES):
-            logger.error(f"No core ingredients found. Available categories: {ingredient_categories}")
-            raise ValueError("At least one ingredient should be a vegetable, carb, protein, or fruit.")
+        cache_key = recipe_cache_key(request)
+        cached = recipe_cache.get(cache_key)  # Single lookup, so an entry expiring in between can't raise KeyError
+        if cached is not None:
+            logger.info("✅ Returning cached recipes")
+            return cached
+
+        prompt, matched_with_database, matched_via_llm = await build_recipe_prompt(request)
+
+        async with LLM_SEM:
+            response = await client.chat.completions.create(
+                messages=[{"role": "system", "content": prompt}],
+                model="gpt-4o-mini",
+                temperature=1,
+                max_tokens=4096,
+                top_p=1
+            )
+        response_text = response.choices[0].message.content.strip()
 
-        prompt = (
-            f"Generate up to 5 recipes using these ingredients: {', '.join(valid_ingredients)}. "
-            f"Give preference to: {', '.join(request.liked_ingredients)}. "
-            f"Exclude: {', '.join(request.excluded_ingredients)}. "
-            "Ensure the recipes make culinary sense. "
-            "Each recipe must be in JSON format with the following keys: "
-            "'title', 'ingredients' (list of objects with 'ingredient' and 'quantity'), "
-            "'instructions' (list), 'estimated_cooking_time', 'difficulty_level'. "
-            "Return only a valid JSON list, no extra text."
+        logger.info("Raw LLM Response: %s", response_text)
+
+        recipes_data = parse_llm_json(response_text)
+
+        # Every recipe shares the same debug details, so build them once
+        debug_info = DebugInfo(
+            matched_with_database=matched_with_database,
+            matched_via_llm=matched_via_llm,
+            raw_llm_response=response_text
         )
+        recipes = [RecipeResponseWithDebug(**recipe, debug_info=debug_info) for recipe in recipes_data]
+        if recipes:  # Don't pin an empty LLM reply for the whole TTL
+            recipe_cache[cache_key] = recipes
+
+        return recipes
+    except Exception as e:
+        logger.error("⚠️ Error generating recipes: %s", e)
+        raise
+
 
-        response = client.chat.completions.create(
+async def stream_recipe(prompt: str) -> AsyncIterator[str]:
+    """
+    Streams the LLM's reply to a recipe generation prompt as it is produced.
+
+    Args:
+        prompt (str): The prompt built by build_recipe_prompt.
+
+    Yields:
+        str: Chunks of the raw LLM response text.
+    """
+    async with LLM_SEM:
+        response = await client.chat.completions.create(
             messages=[{"role": "system", "content": prompt}],
             model="gpt-4o-mini",
             temperature=1,
             max_tokens=4096,
-            top_p=1
+            top_p=1,
+            stream=True
         )
-        response_text = response.choices[0].message.content.strip()
-
-        logger.info(f"Raw LLM Response: {response_text}")
-
-        recipes_data = json.loads(response_text.strip("```json").strip("```"))
 
-        return [
-            RecipeResponseWithDebug(
-                **recipe, debug_info=DebugInfo(
-                    matched_with_database=matched_with_database,
-                    matched_via_llm=matched_via_llm,
-                    raw_llm_response=response_text
-                )
-            ) for recipe in recipes_data
-        ]
-    except Exception as e:
-        logger.error(f"⚠️ Error generating recipes: {str(e)}")
-        raise
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -4,14 +4,47 @@ This module contains API tests for the recipe generation service.
 It uses pytest and FastAPI's TestClient to test the API endpoints.
 """
 
-from unittest.mock import patch
+from types import SimpleNamespace
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
-from app.main import app
-from app.services.recipe_ai import generate_recipe
+from app.main import app, lifespan
+from app.core.db_manager import get_db
 
 # Initialize the FastAPI test client
 client = TestClient(app)
 
+# The database is created in the app lifespan; the tests mock every call that would use it
+app.dependency_overrides[get_db] = lambda: None
+
+# Request body shared by the recipe generation tests
+RECIPE_REQUEST = {
+    "user_id": "test_user",
+    "available_ingredients": ["chicken", "onion", "garlic"],
+    "liked_ingredients": ["chicken"],
+    "excluded_ingredients": [],
+}
+
+def stream_chunk(content):
+    """
+    Build an object shaped like a streamed OpenAI chat completion chunk.
+    """
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+async def mock_llm_stream(*args, **kwargs):
+    """
+    Mock streamed LLM reply delivered in two chunks.
+    """
+    for content in ['[{"title": ', '"Mocked Recipe 1"}]']:
+        yield stream_chunk(content)
+
+async def mock_failing_llm_stream(*args, **kwargs):
+    """
+    Mock streamed LLM reply that fails after the first chunk.
+    """
+    yield stream_chunk("[")
+    raise RuntimeError("LLM connection lost")
+
 def mock_generate_recipe(request):
     """
     Mock function to simulate AI-generated recipes.
@@ -36,13 +69,14 @@ def mock_generate_recipe(request):
         }
     ]
 
-@patch("app.services.recipe_ai.generate_recipe", side_effect=mock_generate_recipe)
-def test_generate_recipe(mock_func):
+@patch("app.main.save_preference")
+@patch("app.main.generate_recipe", side_effect=mock_generate_recipe)
+def test_generate_recipe(mock_func, mock_save):
     """
     Test the /generate-recipe/ endpoint with valid input.
 
-    This test mocks the generate_recipe function to ensure the API
-    returns a structured response containing recipe details.
+    This test mocks the generate_recipe and save_preference functions to ensure
+    the API returns a structured response containing recipe details.
     """
     response = client.post(
         "/generate-recipe/",
@@ -68,3 +102,60 @@ def test_generate_recipe(mock_func):
     assert "instructions" in data[0], "Each recipe should have instructions."
     assert "estimated_cooking_time" in data[0], "Each recipe should have estimated cooking time."
     assert "difficulty_level" in data[0], "Each recipe should have a difficulty level."
+
+    # Preferences are saved in the background after the response
+    mock_save.assert_called_once_with(None, "test_user", ["chicken"], [])
+
+@patch("app.main.save_preference")
+@patch("app.services.recipe_ai.client.chat.completions.create", new_callable=AsyncMock)
+def test_generate_recipe_stream(mock_create, mock_save):
+    """
+    Test the /generate-recipe/ endpoint in streaming mode.
+
+    This test mocks the LLM with a streamed reply to ensure the API returns
+    server-sent events carrying every chunk, followed by a `done` event.
+    """
+    mock_create.return_value = mock_llm_stream()
+
+    response = client.post("/generate-recipe/?stream=true", json=RECIPE_REQUEST)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in response.headers  # Event streams bypass gzip
+    assert response.text == (
+        'data: "[{\\"title\\": "\n\n'
+        'data: "\\"Mocked Recipe 1\\"}]"\n\n'
+        "event: done\ndata: [DONE]\n\n"
+    )
+
+@patch("app.main.save_preference")
+@patch("app.services.recipe_ai.client.chat.completions.create", new_callable=AsyncMock)
+def test_generate_recipe_stream_error(mock_create, mock_save):
+    """
+    Test that a failure while streaming ends the stream with an `error` event.
+    """
+    mock_create.return_value = mock_failing_llm_stream()
+
+    response = client.post("/generate-recipe/?stream=true", json=RECIPE_REQUEST)
+
+    assert response.status_code == 200
+    assert response.text.startswith('data: "["\n\n')
+    assert response.text.endswith('event: error\ndata: "LLM connection lost"\n\n')
+    assert "event: done" not in response.text
+
+@patch("app.main.asyncio.sleep", new_callable=AsyncMock)
+@patch("app.main.make_client")
+async def test_lifespan_closes_client_when_startup_fails(mock_make_client, mock_sleep):
+    """
+    Test that the MongoDB client is closed when every connection attempt fails.
+    """
+    mongo = MagicMock()
+    mongo.close = AsyncMock()
+    mongo.__getitem__.return_value.command = AsyncMock(side_effect=RuntimeError("MongoDB unreachable"))
+    mock_make_client.return_value = mongo
+
+    with pytest.raises(RuntimeError, match="MongoDB unreachable"):
+        async with lifespan(app):
+            pass
+
+    mongo.close.assert_awaited_once()
@@ -0,0 +1,22 @@
+"""
+This module contains unit tests for the MongoDB helpers in db_manager.
+"""
+
+import logging
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import DuplicateKeyError
+from app.core.db_manager import PREFERENCES_COLLECTION, ensure_indexes
+
+async def test_ensure_indexes_logs_duplicate_user_ids(caplog):
+    """
+    Test that duplicate user_id documents are reported instead of aborting startup.
+    """
+    collection = MagicMock()
+    collection.create_index = AsyncMock(side_effect=DuplicateKeyError("E11000 duplicate key error", 11000))
+    db = {PREFERENCES_COLLECTION: collection}
+
+    with caplog.at_level(logging.ERROR):
+        await ensure_indexes(db)
+
+    collection.create_index.assert_awaited_once_with("user_id", unique=True)
+    assert "duplicate user_id documents exist" in caplog.text
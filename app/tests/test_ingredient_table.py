@@ -0,0 +1,15 @@
+"""
+This module checks that the committed ingredient table is in sync with its CSV source.
+"""
+
+import pickle
+from app.data.build_ingredients_table import PICKLE_PATH, build_ingredient_table
+
+def test_ingredient_table_matches_csv():
+    """
+    Test that the pickled table equals a fresh build from the CSV.
+
+    Fails when the CSV was edited without re-running build_ingredients_table.
+    """
+    with open(PICKLE_PATH, "rb") as pickle_file:
+        assert build_ingredient_table() == pickle.load(pickle_file)
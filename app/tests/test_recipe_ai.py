@@ -0,0 +1,80 @@
+"""
+This module contains unit tests for the LLM helpers in the recipe service.
+
+It covers parsing of LLM replies, batched ingredient validation and recipe caching.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from app.schemas.recipe_schema import RecipeRequest
+from app.services.recipe_ai import (
+    call_llm_for_ingredients_batch, generate_recipe, parse_llm_json, recipe_cache, recipe_cache_key
+)
+
+def completion(content):
+    """
+    Build an object shaped like a non-streamed OpenAI chat completion.
+    """
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def test_parse_llm_json_fenced_json():
+    """
+    Test that a ```json fenced reply is decoded.
+    """
+    reply = '```json\n[{"ingredient": "onion", "valid": true}]\n```'
+    assert parse_llm_json(reply) == [{"ingredient": "onion", "valid": True}]
+
+def test_parse_llm_json_bare_fence():
+    """
+    Test that a bare ``` fenced reply is decoded.
+    """
+    reply = '```\n{"title": "Soup"}\n```'
+    assert parse_llm_json(reply) == {"title": "Soup"}
+
+def test_parse_llm_json_unfenced():
+    """
+    Test that a reply without fences is decoded as is.
+    """
+    assert parse_llm_json(' [1, 2, 3] \n') == [1, 2, 3]
+
+def test_parse_llm_json_keeps_trailing_letters():
+    """
+    Test that values ending in the letters of "json" are not stripped along with the fence.
+    """
+    reply = '```json\n{"cuisine": "fusion", "dishes": "tacos", "drink": "espresso"}\n```'
+    assert parse_llm_json(reply) == {"cuisine": "fusion", "dishes": "tacos", "drink": "espresso"}
+
+def test_parse_llm_json_fence_inside_string():
+    """
+    Test that a backtick fence inside a string value survives fence stripping.
+    """
+    reply = '```json\n{"instructions": "Wrap the code in ``` fences"}\n```'
+    assert parse_llm_json(reply) == {"instructions": "Wrap the code in ``` fences"}
+
+@patch("app.services.recipe_ai.build_recipe_prompt", new_callable=AsyncMock, return_value=("prompt", [], []))
+@patch("app.services.recipe_ai.client.chat.completions.create", new_callable=AsyncMock)
+async def test_generate_recipe_does_not_cache_empty_reply(mock_create, mock_prompt):
+    """
+    Test that an empty list of recipes is returned but not cached.
+    """
+    mock_create.return_value = completion("[]")
+    request = RecipeRequest(user_id="test_user", available_ingredients=["chicken", "onion", "garlic"])
+
+    assert await generate_recipe(request) == []
+    assert recipe_cache_key(request) not in recipe_cache
+
+@patch("app.services.recipe_ai.client.chat.completions.create", new_callable=AsyncMock)
+async def test_ingredient_batch_skips_malformed_entries(mock_create):
+    """
+    Test that a malformed entry in a batched LLM reply only drops that entry.
+    """
+    mock_create.return_value = completion(
+        '[{"ingredient": "rice", "valid": "YES", "category": "grain"},'
+        ' {"ingredient": "quinoa", "valid": true},'
+        ' {"valid": "YES", "category": "grain"},'
+        ' {"ingredient": "gravel", "valid": "NO", "category": "None"}]'
+    )
+
+    verdicts = await call_llm_for_ingredients_batch(["rice", "quinoa", "gravel"])
+
+    assert verdicts == {"rice": (True, "grain"), "quinoa": (True, None), "gravel": (False, None)}
@@ -0,0 +1,59 @@
+"""
+This module contains unit tests for the recipe request schema.
+
+It checks that ingredient names are normalized and preferences are validated at parse time.
+"""
+
+import pytest
+from pydantic import ValidationError
+from app.schemas.recipe_schema import RecipeRequest
+
+def test_recipe_request_normalizes_ingredients():
+    """
+    Test that every ingredient list is lowercased, stripped of spaces and lemmatized.
+    """
+    request = RecipeRequest(
+        user_id="test_user",
+        available_ingredients=["Chicken Breast", "Onions", "Tomatoes"],
+        liked_ingredients=["Chicken Breast"],
+        excluded_ingredients=["Tomatoes"],
+    )
+    assert request.available_ingredients == ["chickenbreast", "onion", "tomato"]
+    assert request.liked_ingredients == ["chickenbreast"]
+    assert request.excluded_ingredients == ["tomato"]
+
+def test_recipe_request_accepts_plural_preferences():
+    """
+    Test that a plural preference matches its singular available ingredient.
+    """
+    request = RecipeRequest(
+        user_id="test_user",
+        available_ingredients=["onion", "garlic", "rice"],
+        liked_ingredients=["Onions"],
+    )
+    assert request.liked_ingredients == ["onion"]
+
+def test_recipe_request_rejects_unavailable_preferences():
+    """
+    Test that a preference missing from the available ingredients is rejected.
+    """
+    with pytest.raises(ValidationError, match="must be in available_ingredients"):
+        RecipeRequest(
+            user_id="test_user",
+            available_ingredients=["onion", "garlic", "rice"],
+            excluded_ingredients=["Carrots"],
+        )
+
+def test_recipe_request_defaults_omitted_preferences():
+    """
+    Test that omitted or null preferences default to empty lists.
+    """
+    request = RecipeRequest(user_id="test_user", available_ingredients=["onion", "garlic", "rice"])
+    assert request.liked_ingredients == []
+    assert request.excluded_ingredients == []
+
+    request = RecipeRequest(
+        user_id="test_user", available_ingredients=["onion"], liked_ingredients=None, excluded_ingredients=None
+    )
+    assert request.liked_ingredients == []
+    assert request.excluded_ingredients == []
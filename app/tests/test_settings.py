@@ -0,0 +1,35 @@
+"""
+This module contains unit tests for the application settings.
+"""
+
+import pytest
+from app.core.settings import Settings, get_settings
+
+def test_settings_read_environment_on_init(monkeypatch):
+    """
+    Test that settings are read from the environment when they are created.
+    """
+    monkeypatch.setenv("MONGO_DB_NAME", "override_db")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "2")
+    settings = Settings()
+    assert settings.MONGO_DB_NAME == "override_db"
+    assert settings.MONGO_MIN_POOL_SIZE == 2
+
+def test_settings_missing_variables(monkeypatch):
+    """
+    Test that a missing required variable is reported by name.
+    """
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    with pytest.raises(ValueError, match="GITHUB_TOKEN"):
+        Settings()
+
+def test_get_settings_cache_clear(monkeypatch):
+    """
+    Test that clearing the get_settings cache picks up a changed environment.
+    """
+    monkeypatch.setenv("MONGO_DB_NAME", "override_db")
+    get_settings.cache_clear()
+    try:
+        assert get_settings().MONGO_DB_NAME == "override_db"
+    finally:
+        get_settings.cache_clear()